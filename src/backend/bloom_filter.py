@@ -0,0 +1,55 @@
+"""
+    @file Responsible for a compact probabilistic set (Bloom filter) used to answer "definitely not present" in memory
+"""
+
+#------------------------------STANDARD DEPENDENCIES-----------------------------#
+import math
+import hashlib
+import threading
+from typing import Iterable
+
+#-----------------------------3RD PARTY DEPENDENCIES-----------------------------#
+
+#--------------------------------OUR DEPENDENCIES--------------------------------#
+
+class BloomFilter():
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        """
+            \n@param: capacity      - How many items the filter is sized for (more still works, just more false positives)
+            \n@param: error_rate    - Target false positive rate once 'capacity' items have been added
+            \n@Note: Never gives false negatives -- if 'item in filter' is False, the item was never added
+        """
+        capacity = max(1, capacity)
+        self.capacity = capacity
+        self._num_bits = max(8, int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)))
+        self._num_hashes = max(1, int(round(self._num_bits / capacity * math.log(2))))
+        self._bits = bytearray((self._num_bits + 7) // 8)
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def _indexes(self, item: str):
+        """Double hashing (Kirsch-Mitzenmacher): derives all k bit positions from one digest"""
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self._num_hashes):
+            yield (h1 + i * h2) % self._num_bits
+
+    def add(self, item: str):
+        with self._lock:
+            for idx in self._indexes(item):
+                self._bits[idx >> 3] |= 1 << (idx & 7)
+            self.count += 1
+
+    @property
+    def is_over_capacity(self) -> bool:
+        """True once more items were added than the filter was sized for (false positives climb past error_rate)"""
+        return self.count > self.capacity
+
+    def update(self, items: Iterable[str]):
+        for item in items:
+            self.add(item)
+
+    def __contains__(self, item: str) -> bool:
+        # bits are only ever set, so reading without the lock can at worst miss an add that is still in progress
+        return all(self._bits[idx >> 3] & (1 << (idx & 7)) for idx in self._indexes(item))
@@ -4,6 +4,7 @@
 import os, sys
 import argparse # cli paths
 import datetime
+import threading
 from typing import Optional, Dict, List
 
 #-----------------------------3RD PARTY DEPENDENCIES-----------------------------#
@@ -24,6 +25,8 @@ class DB_Manager():
         self._user = user
         self._pwd = pwd
         self._db = db
+        # pymysql connections aren't thread safe -- every query on self.conn (from any request thread) holds this
+        self._conn_lock = threading.RLock()
         try:
             # self.connect_db()
             pass
@@ -53,44 +56,87 @@ class DB_Manager():
         self.conn.ping(reconnect=True)
         self.cursor = self.conn.cursor()
 
+    def _query(self, query: str, args=None) -> List[dict]:
+        """Runs 'query' on its own cursor while holding the connection lock and returns all its rows.
+        \n@Note: Request threads share self.conn, so results fetched from the shared self.cursor could belong
+        to another thread's query (i.e. another user's password hash)"""
+        with self._conn_lock:
+            self.conn.ping(reconnect=True)
+            with self.conn.cursor() as cursor:
+                cursor.execute(query, args)
+                return cursor.fetchall()
+
     def updatePwd(self):
         "WIP"
         pass
 
     def add_user(self, fname:str, lname:str, username:str, pwd:str) -> int:
         """Creates a new database entry for a user and returns its unique id.
+        \n:param pwd is the already hashed password (see PasswordHasher)
 
         Returns:
             int: The id of the newly created user (-1 if error)
         """
-        self.check_conn()
         try:
-            self.cursor.execute("call add_user(%s, %s, %s, %s)",
-                (fname, lname, username, pwd))
+            rows = self._query("call add_user(%s, %s, %s, %s)", (fname, lname, username, pwd))
 
             # ignore name of field and just get the value
-            return list(self.cursor.fetchall()[0].values())[0]
+            return list(rows[0].values())[0]
         except Exception as err:
             print(f"add_car error: {err}")
             return -1
 
     def does_username_exist(self, uname: str) -> bool:
-        self.check_conn()
         try:
-            self.cursor.execute("call does_username_exist(%s)", (uname))
+            rows = self._query("call does_username_exist(%s)", (uname))
 
             # ignore name of field and just get the value
-            return list(self.cursor.fetchall()[0].values())[0]
+            return list(rows[0].values())[0]
         except Exception as err:
             print(f"does_username_exist error: {err}")
             return -1
 
+    def _open_conn(self, cursorclass=pymysql.cursors.DictCursor):
+        """Opens a separate connection (for one-off startup queries that shouldn't touch self.cursor)"""
+        return pymysql.connect(
+            host=self._host,
+            user=self._user,
+            password=self._pwd,
+            db=self._db,
+            charset="utf8mb4",
+            cursorclass=cursorclass
+        )
+
+    def count_users(self) -> int:
+        """:returns the number of rows in the users table"""
+        conn = self._open_conn()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("select count(*) from users")
+                # ignore name of field and just get the value
+                return list(cursor.fetchone().values())[0]
+        finally:
+            conn.close()
+
+    def stream_usernames(self, chunk_size: int = 10000):
+        """Yields every username without loading the whole users table into memory.
+        \n@Note: Uses its own unbuffered connection so it does not tie up self.cursor"""
+        conn = self._open_conn(pymysql.cursors.SSCursor)
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("select username from users")
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows: break
+                    for row in rows:
+                        yield row[0]
+        finally:
+            conn.close()
+
     def get_user_id(self, uname) -> int:
         """:returns the user_id of user with 'username' (-1 on error)"""
-        self.check_conn()
         try:
-            self.cursor.execute("select get_user_id(%s)", uname)
-            user_ids = list(self.cursor.fetchone().values())[0]
+            user_ids = list(self._query("select get_user_id(%s)", uname)[0].values())[0]
             # use '.values()' to make python agnostic to the name of returned col in procedure
             # return user_ids[0].values()[0] if len(user_ids) > 0 else -1
             return user_ids if user_ids is not None else -1
@@ -98,10 +144,10 @@ class DB_Manager():
             return -1
 
     def update_pwd(self, uname: str, pwd: str) -> bool:
-        """:returns -1 on error, 1 on success"""
-        self.check_conn()
+        """:returns -1 on error, 1 on success
+        \n:param pwd is the already hashed password (see PasswordHasher)"""
         try:
-            self.cursor.execute("call update_pwd(%s, %s)", (uname, pwd))
+            self._query("call update_pwd(%s, %s)", (uname, pwd))
 
             # ignore name of field and just get the value
             return 1
@@ -109,15 +155,26 @@ class DB_Manager():
             print(f"update_pwd error: {err}")
             return -1
 
-    def check_password(self, uname: str, pwd: str) -> bool:
-        """Returns True if password and username are valid to login"""
-        self.check_conn()
+    def check_legacy_password(self, uname: str, pwd: str) -> bool:
+        """Returns True if 'pwd' matches a password stored (and hashed) by the old check_password procedure.
+        \n@Note: Only for accounts that haven't logged in since hashing moved to the server"""
         try:
-            self.cursor.execute("call check_password(%s, %s)", (uname, pwd))
+            rows = self._query("call check_password(%s, %s)", (uname, pwd))
 
             # ignore name of field and just get the value
-            return list(self.cursor.fetchall()[0].values())[0]
+            return list(rows[0].values())[0] == 1
         except Exception as err:
-            print(f"check_password error: {err}")
-            return -1
+            print(f"check_legacy_password error: {err}")
+            return False
+
+    def get_pwd_hash(self, uname: str) -> str:
+        """:returns the stored password hash for 'uname' (None if no such user or on error)"""
+        try:
+            rows = self._query("call get_pwd_hash(%s)", (uname))
+
+            # ignore name of field and just get the value
+            return list(rows[0].values())[0] if len(rows) > 0 else None
+        except Exception as err:
+            print(f"get_pwd_hash error: {err}")
+            return None
 
@@ -0,0 +1,539 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+    @file Load generator for the auth & page routes -- reports throughput, latency percentiles & error rates as json
+    \n@Note: Latencies are per HTTP request ("<METHOD> <path>"), actions (i.e. a signup) only get success counts
+    \n@Note: By default it starts its own server backed by an in-memory database stand-in (no MySQL needed),
+    use '--url' to point it at an already running server instead
+"""
+
+#------------------------------STANDARD DEPENDENCIES-----------------------------#
+import os
+import re
+import math
+import json
+import time
+import random
+import socket
+import argparse # cli paths
+import threading
+import contextlib
+import http.cookiejar
+import urllib.error
+import urllib.parse
+import urllib.request
+from typing import Optional, Dict, List, Tuple
+
+#-----------------------------3RD PARTY DEPENDENCIES-----------------------------#
+
+#--------------------------------Project Includes--------------------------------#
+
+ROUTES = {
+    "signup": "/user/signup",
+    "login": "/user/login",
+    "forgot_password": "/user/forgot_password",
+    "logout": "/user/logout",
+    "index": "/index",
+}
+DEFAULT_MIX = "signup=1,login=3,forgot_password=1,logout=2,index=10"
+CSRF_RE = re.compile(r'name="csrf_token"[^>]*value="([^"]+)"')
+PROC_RE = re.compile(r"^\s*(?:call|select)\s+(\w+)\(", re.IGNORECASE)
+
+#--------------------------------Database Stand-In-------------------------------#
+class LocalDatabase():
+    """Thread safe in-memory stand-in for the users table & the procedures DB_Manager calls"""
+    def __init__(self):
+        self._users: Dict[str, dict] = {} # lowercase username -> row (mimics MySQL's case insensitive collation)
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def call(self, proc: str, args: tuple) -> List[dict]:
+        with self._lock:
+            if proc == "add_user":
+                fname, lname, username, pwd = args
+                if username.lower() in self._users:
+                    raise ValueError(f"Duplicate entry '{username}' for key 'username'")
+                user_id = self._next_id
+                self._next_id += 1
+                self._users[username.lower()] = {"user_id": user_id, "username": username, "pwd": pwd}
+                return [{"user_id": user_id}]
+            elif proc == "does_username_exist":
+                return [{"exists": int(args[0].lower() in self._users)}]
+            elif proc == "get_user_id":
+                user = self._users.get(args[0].lower())
+                return [{"user_id": user["user_id"] if user else None}]
+            elif proc == "update_pwd":
+                user = self._users.get(args[0].lower())
+                if user: user["pwd"] = args[1]
+                return []
+            elif proc == "get_pwd_hash":
+                user = self._users.get(args[0].lower())
+                return [{"pwd": user["pwd"]}] if user else []
+            raise ValueError(f"LocalDatabase does not implement '{proc}'")
+
+    def usernames(self) -> List[str]:
+        with self._lock:
+            return [user["username"] for user in self._users.values()]
+
+class LocalCursor():
+    """Looks enough like a pymysql DictCursor for DB_Manager's queries"""
+    def __init__(self, db: LocalDatabase):
+        self._db = db
+        self._rows: List[dict] = []
+
+    def execute(self, query: str, args=None):
+        match = PROC_RE.match(query)
+        if match is None:
+            raise ValueError(f"LocalCursor can't run query: {query}")
+        # DB_Manager sometimes passes a bare string instead of a tuple
+        args = tuple(args) if isinstance(args, (tuple, list)) else (args,)
+        self._rows = self._db.call(match.group(1), args)
+
+    def fetchall(self) -> List[dict]:
+        return self._rows
+
+    def fetchone(self) -> Optional[dict]:
+        return self._rows[0] if len(self._rows) > 0 else None
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class LocalConnection():
+    """Looks enough like a pymysql connection for DB_Manager (every cursor reads from the same LocalDatabase)"""
+    def __init__(self, db: LocalDatabase):
+        self._db = db
+
+    def ping(self, reconnect: bool = True):
+        pass
+
+    def cursor(self) -> LocalCursor:
+        return LocalCursor(self._db)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+def start_local_server(port: int, hash_rounds: Optional[int]) -> LocalDatabase:
+    """Starts the real ChessWeb app (in a daemon thread) with its database swapped for a LocalDatabase"""
+    from main import ChessWeb
+
+    db = LocalDatabase()
+
+    class LocalChessWeb(ChessWeb):
+        # same layout as the real server: one connection + one shared self.cursor for every request thread
+        # (check_conn/cleanup are inherited so their cursor reassignment happens here too)
+        def connect_db(self):
+            self.conn = LocalConnection(db)
+            self.cursor = self.conn.cursor()
+
+        def count_users(self) -> int:
+            return len(db.usernames())
+
+        def stream_usernames(self, chunk_size: int = 10000):
+            return iter(db.usernames())
+
+    server = threading.Thread(
+        target=LocalChessWeb,
+        args=(port, False, "load_test", None, "local", "localhost"),
+        kwargs={"hash_rounds": hash_rounds},
+        daemon=True
+    )
+    server.start()
+    return db
+
+def get_free_port() -> int:
+    with contextlib.closing(socket.socket(socket.AF_INET, socket.SOCK_STREAM)) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def wait_for_server(base_url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(base_url + ROUTES["index"], timeout=1).read()
+            return
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.1)
+    raise SystemExit(f"Server at {base_url} did not come up within {timeout}s")
+
+#-------------------------------------Stats--------------------------------------#
+class Stats():
+    """
+        \n@Brief: Two views of a run:
+        \n  requests - every single HTTP round trip, keyed by "<METHOD> <path>" (redirect hops are their own requests)
+        \n  actions  - one user level step from the mix (i.e. signup = GET form + POST form + GET of the redirect),
+        only counted for success/failure since its latency depends on how many requests it takes
+    """
+    def __init__(self):
+        self._latencies: Dict[str, List[float]] = {}
+        self._request_errors: Dict[str, int] = {}
+        self._actions: Dict[str, int] = {name: 0 for name in ROUTES}
+        self._action_errors: Dict[str, int] = {name: 0 for name in ROUTES}
+        self._error_samples: List[str] = []
+        self._lock = threading.Lock()
+
+    def _add_sample(self, error: str):
+        if len(self._error_samples) < 20:
+            self._error_samples.append(error)
+
+    def record_request(self, request: str, latency: float, error: Optional[str] = None):
+        with self._lock:
+            self._latencies.setdefault(request, []).append(latency)
+            self._request_errors.setdefault(request, 0)
+            if error is not None:
+                self._request_errors[request] += 1
+                self._add_sample(error)
+
+    def record_action(self, action: str, error: Optional[str] = None):
+        with self._lock:
+            self._actions[action] += 1
+            if error is not None:
+                self._action_errors[action] += 1
+                # request level failures were already sampled when they happened
+                if error not in self._error_samples: self._add_sample(error)
+
+    @staticmethod
+    def _percentile(sorted_vals: List[float], pct: float) -> float:
+        """Nearest-rank percentile"""
+        if len(sorted_vals) == 0: return 0.0
+        rank = max(1, math.ceil(pct / 100 * len(sorted_vals)))
+        return sorted_vals[rank - 1]
+
+    def _summary(self, latencies: List[float], errors: int, elapsed: float) -> dict:
+        vals = sorted(latencies)
+        count = len(vals)
+        return {
+            "requests": count,
+            "errors": errors,
+            "error_rate": round(errors / count, 4) if count else 0.0,
+            "throughput_rps": round(count / elapsed, 2) if elapsed > 0 else 0.0,
+            "latency_ms": {
+                "p50": round(self._percentile(vals, 50) * 1000, 2),
+                "p95": round(self._percentile(vals, 95) * 1000, 2),
+                "p99": round(self._percentile(vals, 99) * 1000, 2),
+                "mean": round(sum(vals) / count * 1000, 2) if count else 0.0,
+                "max": round(vals[-1] * 1000, 2) if count else 0.0,
+            },
+        }
+
+    def report(self, elapsed: float) -> dict:
+        with self._lock:
+            all_latencies = [lat for lats in self._latencies.values() for lat in lats]
+            return {
+                "total": self._summary(all_latencies, sum(self._request_errors.values()), elapsed),
+                "requests": {
+                    name: self._summary(lats, self._request_errors[name], elapsed)
+                    for name, lats in self._latencies.items()
+                },
+                "actions": {
+                    name: {
+                        "actions": self._actions[name],
+                        "errors": self._action_errors[name],
+                        "error_rate": round(self._action_errors[name] / self._actions[name], 4),
+                        "throughput_aps": round(self._actions[name] / elapsed, 2) if elapsed > 0 else 0.0,
+                    }
+                    for name in ROUTES if self._actions[name] > 0
+                },
+                "error_samples": list(self._error_samples),
+            }
+
+#----------------------------------Virtual Users---------------------------------#
+class RequestFailed(Exception):
+    pass
+
+class KeepRedirects(urllib.request.HTTPErrorProcessor):
+    """Hands every response back as-is so redirects (and error codes) can be timed as their own requests"""
+    def http_response(self, request, response):
+        return response
+    https_response = http_response
+
+class VirtualUser():
+    def __init__(self, base_url: str, worker_id: int, timeout: float, stats: Stats):
+        """
+            \n@param: base_url  - Where the server is (i.e. http://localhost:10225)
+            \n@param: worker_id - Unique id (keeps generated usernames unique across workers)
+            \n@param: timeout   - Seconds before a request counts as failed
+            \n@param: stats     - Where every request's latency gets recorded
+            \n@Note: Every virtual user has its own cookie jar (session + csrf) like a separate browser
+        """
+        self._base_url = base_url
+        self._timeout = timeout
+        self._stats = stats
+        self._prefix = f"lt{os.getpid()}w{worker_id}"
+        self._opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()),
+            KeepRedirects()
+        )
+        self._num_accounts = 0
+        self.accounts: List[Tuple[str, str]] = [] # (username, password) of accounts this user created
+        self.logged_in = False
+
+    def _request(self, path: str, form: Optional[dict] = None) -> Tuple[int, Optional[str], str]:
+        """
+            \n@Brief: Does exactly one HTTP round trip (recorded as "<METHOD> <path>")
+            \n@Returns: (status, redirect location, body), raises RequestFailed on http/network errors
+        """
+        method = "GET" if form is None else "POST"
+        name = f"{method} {path}"
+        data = urllib.parse.urlencode(form).encode() if form is not None else None
+        start = time.perf_counter()
+        try:
+            with self._opener.open(self._base_url + path, data=data, timeout=self._timeout) as res:
+                body = res.read().decode(errors="replace")
+                status, location = res.status, res.headers.get("Location")
+        except (urllib.error.URLError, ConnectionError, socket.timeout) as err:
+            error = f"{type(err).__name__} on {name}: {err}"
+            self._stats.record_request(name, time.perf_counter() - start, error)
+            raise RequestFailed(error)
+
+        error = f"HTTP {status} on {name}" if status >= 400 else None
+        self._stats.record_request(name, time.perf_counter() - start, error)
+        if error is not None: raise RequestFailed(error)
+        return status, location, body
+
+    def _fetch(self, path: str, form: Optional[dict] = None) -> Tuple[str, str]:
+        """Like a browser: follows redirects (as GETs). Returns (path it ended up on, body)"""
+        for _ in range(10):
+            status, location, body = self._request(path, form)
+            if status not in (301, 302, 303, 307, 308) or location is None:
+                return path, body
+            path = urllib.parse.urlparse(urllib.parse.urljoin(self._base_url + path, location)).path
+            form = None
+        raise RequestFailed(f"Too many redirects ending at {path}")
+
+    def _submit(self, path: str, form: dict) -> str:
+        """GETs the form page for its csrf token, then POSTs the form. Returns the path it ended up on"""
+        _, page = self._fetch(path)
+        match = CSRF_RE.search(page)
+        if match is None:
+            raise RequestFailed(f"No csrf token on {path}")
+        landed, _ = self._fetch(path, dict(form, csrf_token=match.group(1)))
+        return landed
+
+    def signup(self):
+        self._num_accounts += 1
+        username = f"{self._prefix}u{self._num_accounts}"
+        pwd = f"pwd-{random.getrandbits(32):08x}"
+        landed = self._submit(ROUTES["signup"], {
+            "fname": "Load", "lname": "Test", "username": username, "password": pwd, "password2": pwd
+        })
+        if landed != ROUTES["login"]:
+            raise RequestFailed(f"Signup for {username} landed on {landed}")
+        self.accounts.append((username, pwd))
+
+    def login(self):
+        username, pwd = random.choice(self.accounts)
+        landed = self._submit(ROUTES["login"], {"username": username, "password": pwd})
+        if landed not in ("/", ROUTES["index"]):
+            raise RequestFailed(f"Login for {username} landed on {landed}")
+        self.logged_in = True
+
+    def forgot_password(self):
+        idx = random.randrange(len(self.accounts))
+        username = self.accounts[idx][0]
+        new_pwd = f"pwd-{random.getrandbits(32):08x}"
+        landed = self._submit(ROUTES["forgot_password"], {"username": username, "new_password": new_pwd})
+        if landed not in ("/", ROUTES["index"]):
+            raise RequestFailed(f"Password reset for {username} landed on {landed}")
+        self.accounts[idx] = (username, new_pwd)
+
+    def logout(self):
+        landed, _ = self._fetch(ROUTES["logout"])
+        self.logged_in = False
+        if landed != ROUTES["login"]:
+            raise RequestFailed(f"Logout landed on {landed}")
+
+    def index(self):
+        self._fetch(ROUTES["index"])
+
+    def prerequisite(self, action: str) -> Optional[str]:
+        """:returns the action that has to run first for 'action' to make sense (None if ready)"""
+        needs_account = action in ("login", "forgot_password", "logout")
+        if needs_account and len(self.accounts) == 0: return "signup"
+        # logged in users get bounced off the login/signup pages
+        if action in ("login", "signup") and self.logged_in: return "logout"
+        if action == "logout" and not self.logged_in: return "login"
+        return None
+
+#-------------------------------------Runner-------------------------------------#
+def parse_mix(mix: str) -> Dict[str, float]:
+    """Parses 'signup=1,login=3,...' into {action: weight}"""
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ROUTES:
+            raise argparse.ArgumentTypeError(f"Unknown route '{name}' in mix (expected one of {list(ROUTES)})")
+        try:
+            weights[name] = float(weight)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"Bad weight '{weight}' for '{name}' in mix")
+    if sum(weights.values()) <= 0:
+        raise argparse.ArgumentTypeError("Mix weights must add up to more than 0")
+    return weights
+
+def run_worker(user: VirtualUser, mix: Dict[str, float], stats: Stats, deadline: float, budget: List[int],
+                budget_lock: threading.Lock):
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    while time.monotonic() < deadline:
+        with budget_lock:
+            if budget[0] == 0: return
+            budget[0] -= 1
+
+        action = random.choices(names, weights)[0]
+        # run whatever the action depends on first (each recorded as its own action)
+        chain = [action]
+        while True:
+            before = user.prerequisite(chain[0])
+            if before is None or before in chain: break
+            chain.insert(0, before)
+
+        for step in chain:
+            try:
+                getattr(user, step)()
+                stats.record_action(step)
+            except RequestFailed as err:
+                stats.record_action(step, str(err))
+                break
+
+def run_load(base_url: str, concurrency: int, duration: float, max_actions: Optional[int],
+            mix: Dict[str, float], timeout: float) -> dict:
+    stats = Stats()
+    deadline = time.monotonic() + duration
+    # -1 = no limit on the number of actions
+    budget = [max_actions if max_actions is not None else -1]
+    budget_lock = threading.Lock()
+
+    workers = [
+        threading.Thread(
+            target=run_worker,
+            args=(VirtualUser(base_url, worker_id, timeout, stats), mix, stats, deadline, budget, budget_lock),
+            daemon=True
+        )
+        for worker_id in range(concurrency)
+    ]
+    start = time.perf_counter()
+    for worker in workers: worker.start()
+    for worker in workers: worker.join()
+    elapsed = time.perf_counter() - start
+
+    report = stats.report(elapsed)
+    report["duration_secs"] = round(elapsed, 3)
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Load test the ChessWeb auth & page routes")
+    parser.add_argument(
+        "-u", "--url",
+        required=False,
+        default=None,
+        dest="url",
+        help="Base url of a running server (i.e. http://localhost:10225). " +
+            "If not given, a local server with an in-memory database stand-in is started"
+    )
+    parser.add_argument(
+        "-c", "--concurrency",
+        type=int,
+        required=False,
+        default=8,
+        dest="concurrency",
+        help="Number of concurrent virtual users"
+    )
+    parser.add_argument(
+        "-t", "--duration",
+        type=float,
+        required=False,
+        default=30,
+        dest="duration",
+        help="How long to run for (seconds)"
+    )
+    parser.add_argument(
+        "-n", "--num_actions",
+        type=int,
+        required=False,
+        default=None,
+        dest="num_actions",
+        help="Stop after this many actions (prerequisite actions not counted) even if time is left"
+    )
+    parser.add_argument(
+        "-m", "--mix",
+        type=parse_mix,
+        required=False,
+        default=DEFAULT_MIX,
+        dest="mix",
+        help=f"Relative weight of each action (default '{DEFAULT_MIX}')"
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        required=False,
+        default=10,
+        dest="timeout",
+        help="Seconds before a single request counts as an error"
+    )
+    parser.add_argument(
+        "--hash_rounds",
+        type=int,
+        required=False,
+        default=None,
+        dest="hash_rounds",
+        help="Password hash cost for the local server (defaults to the server's default)"
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        required=False,
+        default=None,
+        dest="seed",
+        help="Seed for the route mix & generated passwords"
+    )
+    parser.add_argument(
+        "-o", "--output",
+        required=False,
+        default=None,
+        dest="output",
+        help="Write the json report to this file instead of stdout"
+    )
+
+    args = vars(parser.parse_args())
+    if args["seed"] is not None: random.seed(args["seed"])
+
+    # the server prints every request, keep that out of the report
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        base_url = args["url"]
+        if base_url is None:
+            port = get_free_port()
+            start_local_server(port, args["hash_rounds"])
+            base_url = f"http://127.0.0.1:{port}"
+        base_url = base_url.rstrip("/")
+        wait_for_server(base_url)
+
+        report = run_load(base_url, args["concurrency"], args["duration"], args["num_actions"],
+                        args["mix"], args["timeout"])
+
+    report["config"] = {
+        "url": args["url"] if args["url"] is not None else "local",
+        "concurrency": args["concurrency"],
+        "duration_secs": args["duration"],
+        "num_actions": args["num_actions"],
+        "mix": args["mix"],
+        "timeout_secs": args["timeout"],
+        "hash_rounds": args["hash_rounds"],
+        "seed": args["seed"],
+    }
+    out = json.dumps(report, indent=4, sort_keys=True)
+    if args["output"] is not None:
+        with open(args["output"], "w") as f:
+            f.write(out + "\n")
+    else:
+        print(out)
@@ -17,7 +17,7 @@ from typing import TypedDict, List, Tuple
 #-----------------------------3RD PARTY DEPENDENCIES-----------------------------#
 import flask
 from flask import Flask, session, render_template, request, redirect, flash, url_for, jsonify
-import werkzeug.serving # needed to make production worthy app that's secure
+from flask_socketio import SocketIO
 
 # decorate app.route with "@login_required" to make sure user is logged in before doing anything
 from flask_login import login_user, current_user, login_required, logout_user
@@ -30,15 +30,28 @@ from flask_helpers import FlaskHelper, flash_print, is_json, is_form, is_static_
 from registrationForm import RegistrationForm
 from loginForm import LoginForm
 from forgotPasswordForm import ForgotPwdForm
+from spectator import SpectatorHub
 
 class ChessWeb(UserManager):
-    def __init__(self, port: int, is_debug: bool, user: str, pwd: str, db: str, db_host: str):
+    def __init__(self, port: int, is_debug: bool, user: str, pwd: str, db: str, db_host: str,
+                hash_schemes: List[str] = None, hash_rounds: int = None, hash_workers: int = 4,
+                username_filter_size: int = 1000000):
         self.app = Flask("Chess Server App")
         self.app.config["TEMPLATES_AUTO_RELOAD"] = True # refreshes flask if html files change
         self.app.config['SECRET_KEY'] = secrets.token_urlsafe(16)
 
-        UserManager.__init__(self, self.app, user, pwd, db, db_host)
+        UserManager.__init__(self, self.app, user, pwd, db, db_host,
+            hash_schemes=hash_schemes,
+            hash_rounds=hash_rounds,
+            hash_workers=hash_workers,
+            username_filter_size=username_filter_size
+        )
         self.flask_helper = FlaskHelper(self.app, port)
+        # threading mode speaks real WebSockets through simple-websocket (needs Werkzeug >= 2.0 for the dev server to
+        # hand over its socket), without it every spectator silently falls back to HTTP long-polling
+        self.socketio = SocketIO(self.app, async_mode="threading")
+        # live games are pushed to spectators through this (see spectator.py for the protocol)
+        self.spectators = SpectatorHub(self.socketio)
 
         # get the paths relative to this file
         backend_dir = Path(__file__).parent.resolve()
@@ -62,20 +75,19 @@ class ChessWeb(UserManager):
         self.generateRoutes()
         self.flask_helper.print_routes()
 
-
-        is_threaded = True
-
         # start blocking main web server loop (nothing after this is run)
+        # socketio wraps the flask app so the spectator channel is served alongside the normal routes
+        # (async_mode="threading" already serves every request on its own thread)
         if self._is_debug:
-            self.app.run(host=self._host, port=self._port, debug=self._is_debug, threaded=is_threaded)
+            self.socketio.run(self.app, host=self._host, port=self._port, debug=self._is_debug)
         else:
             # FOR PRODUCTION
-            werkzeug.serving.run_simple(
-                hostname=self._host,
+            self.socketio.run(
+                self.app,
+                host=self._host,
                 port=self._port,
-                application=self.app,
-                use_debugger=self._is_debug,
-                threaded=is_threaded
+                debug=self._is_debug,
+                use_reloader=False
             )
 
     def generateRoutes(self):
@@ -92,6 +104,15 @@ class ChessWeb(UserManager):
         def index():
             return render_template("index.html")
 
+        @self.app.route("/user/username_available", methods=["POST"])
+        def usernameAvailable():
+            """Expects json {"username": <str>} and returns {"username": <str>, "available": <bool>}"""
+            data = request.get_json(silent=True)
+            username = data.get("username") if isinstance(data, dict) else None
+            if not isinstance(username, str) or len(username.strip()) == 0:
+                return jsonify({"error": "expected a json body with a non-empty 'username'"}), 400
+            return jsonify({"username": username, "available": not self.does_username_exist(username)})
+
     def createHelperRoutes(self):
         @self.app.before_request
         def log_request():
@@ -309,6 +330,40 @@ if __name__ == '__main__':
         help="Set the host ip address of the database (can be localhost)"
     )
 
+    parser.add_argument(
+        "--hash_schemes",
+        required=False,
+        default="pbkdf2_sha256,mysql41",
+        dest="hash_schemes",
+        help="Comma separated passlib schemes for user passwords. The first hashes new passwords, " +
+            "the rest are still accepted and get upgraded on login (mysql41 = hashes made by the old procedures)"
+    )
+    parser.add_argument(
+        "--hash_rounds",
+        type=int,
+        required=False,
+        default=None,
+        dest="hash_rounds",
+        help="The cost (rounds) of the password hash scheme (defaults to passlib's recommendation)"
+    )
+    parser.add_argument(
+        "--hash_workers",
+        type=int,
+        required=False,
+        default=4,
+        dest="hash_workers",
+        help="Number of threads used to hash/verify passwords"
+    )
+    parser.add_argument(
+        "--username_filter_size",
+        type=int,
+        required=False,
+        default=1000000,
+        dest="username_filter_size",
+        help="Minimum number of usernames the in-memory 'username taken' filter is sized for " +
+            "(it is sized for twice the current number of users if that is bigger)"
+    )
+
     # Actually Parse Flags (turn into dictionary)
     args = vars(parser.parse_args())
 
@@ -322,4 +377,9 @@ if __name__ == '__main__':
     #     args["pwd"] = getpass.getpass(pass_msg)
 
     # start app
-    app = ChessWeb(args["port"], args["debugMode"], args["db_user"], args["pwd"], args["db"], args["db_host"])
+    app = ChessWeb(args["port"], args["debugMode"], args["db_user"], args["pwd"], args["db"], args["db_host"],
+        hash_schemes=args["hash_schemes"].split(","),
+        hash_rounds=args["hash_rounds"],
+        hash_workers=args["hash_workers"],
+        username_filter_size=args["username_filter_size"]
+    )
@@ -0,0 +1,82 @@
+"""
+    @file Responsible for hashing & verifying user passwords (so the hashing policy lives with the server and not MySQL)
+"""
+
+#------------------------------STANDARD DEPENDENCIES-----------------------------#
+import atexit
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Tuple
+
+#-----------------------------3RD PARTY DEPENDENCIES-----------------------------#
+from passlib.context import CryptContext
+from passlib.registry import get_crypt_handler
+
+#--------------------------------OUR DEPENDENCIES--------------------------------#
+
+# mysql41 = MySQL's PASSWORD() ("*<40 hex>"), what the old stored procedures saved -- kept so those users can still
+# log in (and get upgraded to the default scheme when they do)
+DEFAULT_SCHEMES = ["pbkdf2_sha256", "mysql41"]
+
+class PasswordHasher():
+    def __init__(self,
+                schemes: Optional[List[str]] = None,
+                rounds: Optional[int] = None,
+                max_workers: int = 4,
+                max_pending: int = 64):
+        """
+            \n@param: schemes       - passlib scheme names (default pbkdf2_sha256 + legacy mysql41), the first is used for
+                                    new hashes and the rest are only accepted for verification (and get upgraded on login)
+            \n@param: rounds        - Cost for the default scheme (None = passlib's default)
+            \n@param: max_workers   - Number of threads doing the expensive hash/verify work
+            \n@param: max_pending   - Max number of hash/verify jobs queued or running before callers have to wait
+            \n@Note: pbkdf2/bcrypt/argon2 release the GIL so a thread pool lets several hashes run in parallel while
+            bounding how many cores a login spike can eat
+        """
+        schemes = schemes if schemes else DEFAULT_SCHEMES
+        default_scheme = schemes[0]
+        settings = {}
+        if rounds is not None:
+            if "rounds" not in get_crypt_handler(default_scheme).setting_kwds:
+                raise ValueError(f"Password hash scheme '{default_scheme}' does not support a rounds cost")
+            settings[f"{default_scheme}__rounds"] = rounds
+
+        # deprecated="auto" -> everything but the default scheme needs updating
+        self._context = CryptContext(schemes=schemes, default=default_scheme, deprecated="auto", **settings)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pwd_hasher")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        # let in-flight hashes finish (i.e. a password reset being written) when the server exits
+        atexit.register(self.shutdown)
+
+    def _run(self, func, *args):
+        """Runs 'func' on the worker pool and waits for its result (blocks if too many jobs are already pending)"""
+        with self._slots:
+            return self._pool.submit(func, *args).result()
+
+    def hash(self, pwd: str) -> str:
+        """:returns the hash to store for 'pwd' using the default scheme & cost"""
+        return self._run(self._context.hash, pwd)
+
+    def is_known_hash(self, pwd_hash: str) -> bool:
+        """:returns True if 'pwd_hash' was made by one of the configured schemes"""
+        return self._context.identify(pwd_hash) is not None
+
+    def verify_and_update(self, pwd: str, pwd_hash: Optional[str]) -> Tuple[bool, Optional[str]]:
+        """
+            \n@Brief: Checks 'pwd' against the stored 'pwd_hash'
+            \n@Returns: (is_valid, new_hash) where new_hash is not None if the stored hash is outdated (old scheme/cost)
+            and should be replaced
+            \n@Note: If there is no stored hash, still spends the time of a verify so unknown users can't be timed
+        """
+        if not pwd_hash:
+            self._run(self._context.dummy_verify)
+            return False, None
+        try:
+            return self._run(self._context.verify_and_update, pwd, pwd_hash)
+        except ValueError as err:
+            # hash not recognized by any configured scheme
+            print(f"verify_and_update error: {err}")
+            return False, None
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True)
@@ -0,0 +1,338 @@
+#!/usr/bin/python3
+"""
+    @file Responsible for (re)computing every user's rating from the full game history in bulk
+    \n@Note: Games are streamed from the database in chronological chunks and each rating period is
+    applied to the whole population at once with numpy (no per-row round trips through DB_Manager)
+"""
+
+#------------------------------STANDARD DEPENDENCIES-----------------------------#
+import math
+import time
+import argparse # cli paths
+from typing import List, Tuple
+
+#-----------------------------3RD PARTY DEPENDENCIES-----------------------------#
+import numpy as np
+import pymysql
+
+#--------------------------------OUR DEPENDENCIES--------------------------------#
+from db_manager import DB_Manager
+
+# columns: white user_id, black user_id, white's score (1 = win, 0.5 = draw, 0 = loss), unix end time
+GAMES_QUERY = """
+    select white_id, black_id, white_score, unix_timestamp(end_time)
+    from games
+    where end_time is not null and white_score is not null
+    order by end_time, game_id
+"""
+USER_IDS_QUERY = "select user_id from users order by user_id"
+
+# results are bulk inserted into a temp table (pymysql only batches INSERT ... VALUES into multi-row statements,
+# executemany on an UPDATE is one round trip per row) and then applied with a single joined UPDATE
+CREATE_UPDATES_QUERY = """
+    create temporary table rating_updates (
+        user_id int primary key,
+        rating double not null,
+        rating_deviation double null
+    )
+"""
+INSERT_UPDATES_QUERY = "insert into rating_updates (user_id, rating, rating_deviation) values (%s, %s, %s)"
+INSERT_ELO_UPDATES_QUERY = "insert into rating_updates (user_id, rating) values (%s, %s)"
+APPLY_UPDATES_QUERY = """
+    update users join rating_updates on users.user_id = rating_updates.user_id
+    set users.rating = rating_updates.rating, users.rating_deviation = rating_updates.rating_deviation
+"""
+# elo has no deviation, so leave whatever glicko last stored alone
+APPLY_ELO_UPDATES_QUERY = """
+    update users join rating_updates on users.user_id = rating_updates.user_id
+    set users.rating = rating_updates.rating
+"""
+DROP_UPDATES_QUERY = "drop temporary table if exists rating_updates"
+
+# Glicko constants (http://www.glicko.net/glicko/glicko.pdf)
+Q = math.log(10) / 400
+DEFAULT_RATING = 1500.0
+DEFAULT_RD = 350.0
+MIN_RD = 30.0
+
+class RatingEngine(DB_Manager):
+    def __init__(self, user: str, pwd: str, db: str, host: str,
+                system: str = "glicko",
+                period_secs: int = 7 * 24 * 60 * 60,
+                rd_growth: float = 34.6,
+                k_factor: float = 32.0,
+                chunk_size: int = 50000):
+        """
+            \n@param: user          - The username to connect to database with
+            \n@param: pwd           - The password to connect to database with
+            \n@param: db            - The name of the database to connect with
+            \n@param: host          - The IP/localhost of the database to connect with
+            \n@param: system        - "glicko" (rating + deviation) or "elo" (fixed k-factor, deviation untouched)
+            \n@param: period_secs   - Length of a rating period (games in the same period are applied together)
+            \n@param: rd_growth     - Glicko 'c' constant, how much deviation grows per period of inactivity
+            \n@param: k_factor      - Elo k-factor (only used when system == "elo")
+            \n@param: chunk_size    - How many games to pull from the database per fetch
+        """
+        if system not in ("glicko", "elo"):
+            raise ValueError(f"Unknown rating system '{system}' (expected 'glicko' or 'elo')")
+
+        DB_Manager.__init__(self, user, pwd, db, host)
+        self._system = system
+        self._period_secs = period_secs
+        self._rd_growth = rd_growth
+        self._k_factor = k_factor
+        self._chunk_size = chunk_size
+
+        # rating arrays are indexed directly by user_id
+        self.ratings = np.empty(0, dtype=np.float64)
+        self.rds = np.empty(0, dtype=np.float64)
+        # period each user last played in (used to grow deviation over inactivity), -1 = never
+        self._last_period = np.empty(0, dtype=np.int64)
+
+    #----------------------------------Public API----------------------------------#
+    def recompute(self) -> float:
+        """
+            \n@Brief: Recomputes every user's rating from scratch and writes them back to the database
+            \n@Returns: The throughput in users per second
+        """
+        start = time.perf_counter()
+        self.connect_db()
+        try:
+            user_ids = self._get_user_ids()
+            self._reset(int(user_ids.max()) if len(user_ids) > 0 else 0)
+
+            num_games = self.process_games(self._stream_games())
+            num_users = self._write_ratings(user_ids)
+        finally:
+            self.cleanup()
+
+        elapsed = time.perf_counter() - start
+        users_per_sec = num_users / elapsed if elapsed > 0 else float(num_users)
+        print(f"Recomputed {num_users} ratings from {num_games} games in {elapsed:.2f}s "
+            f"({users_per_sec:.1f} users/sec)")
+        return users_per_sec
+
+    def process_games(self, chunks) -> int:
+        """
+            \n@Brief: Applies chronologically sorted chunks of games, one rating period at a time
+            \n@Param: chunks - Iterable of (white_ids, black_ids, white_scores, end_times) numpy arrays
+            \n@Returns: The number of games processed
+            \n@Note: Periods can straddle chunk boundaries, so the tail of each chunk is held back
+            until the next chunk (or the end of the stream) proves the period is complete
+        """
+        pending: List[Tuple[np.ndarray, ...]] = []
+        pending_period = None
+        num_games = 0
+
+        for white, black, score, end_time in chunks:
+            if len(white) == 0: continue
+            num_games += len(white)
+            periods = end_time.astype(np.int64) // self._period_secs
+
+            # split the chunk wherever the period changes (input is sorted so each period is contiguous)
+            bounds = np.flatnonzero(np.diff(periods)) + 1
+            starts = np.concatenate(([0], bounds))
+            ends = np.concatenate((bounds, [len(periods)]))
+            for lo, hi in zip(starts, ends):
+                period = int(periods[lo])
+                if pending_period is not None and period != pending_period:
+                    self._apply_period(pending_period, *self._concat(pending))
+                    pending = []
+                pending_period = period
+                pending.append((white[lo:hi], black[lo:hi], score[lo:hi]))
+
+        if pending:
+            self._apply_period(pending_period, *self._concat(pending))
+        return num_games
+
+    #---------------------------------Rating Math----------------------------------#
+    def _reset(self, max_id: int):
+        self.ratings = np.full(max_id + 1, DEFAULT_RATING, dtype=np.float64)
+        self.rds = np.full(max_id + 1, DEFAULT_RD, dtype=np.float64)
+        self._last_period = np.full(max_id + 1, -1, dtype=np.int64)
+
+    def _ensure_capacity(self, max_id: int):
+        """Grows the per-user arrays if a game references a user_id beyond the current size"""
+        size = len(self.ratings)
+        if max_id < size: return
+        extra = max_id + 1 - size
+        self.ratings = np.concatenate((self.ratings, np.full(extra, DEFAULT_RATING)))
+        self.rds = np.concatenate((self.rds, np.full(extra, DEFAULT_RD)))
+        self._last_period = np.concatenate((self._last_period, np.full(extra, -1, dtype=np.int64)))
+
+    @staticmethod
+    def _concat(pending: List[Tuple[np.ndarray, ...]]) -> Tuple[np.ndarray, ...]:
+        if len(pending) == 1: return pending[0]
+        return tuple(np.concatenate(cols) for cols in zip(*pending))
+
+    @staticmethod
+    def _g(rd: np.ndarray) -> np.ndarray:
+        return 1.0 / np.sqrt(1.0 + 3.0 * (Q * rd) ** 2 / math.pi ** 2)
+
+    def _apply_period(self, period: int, white: np.ndarray, black: np.ndarray, score: np.ndarray):
+        """Updates everyone who played in 'period' at once, using the ratings from before the period"""
+        self._ensure_capacity(int(max(white.max(), black.max())))
+        size = len(self.ratings)
+
+        # every game is seen from both sides: (player, opponent, player's score)
+        players = np.concatenate((white, black))
+        opponents = np.concatenate((black, white))
+        scores = np.concatenate((score, 1.0 - score))
+        active = np.unique(players)
+
+        if self._system == "elo":
+            expected = 1.0 / (1.0 + 10.0 ** ((self.ratings[opponents] - self.ratings[players]) / 400.0))
+            delta = np.bincount(players, weights=scores - expected, minlength=size)
+            self.ratings[active] += self._k_factor * delta[active]
+            self._last_period[active] = period
+            return
+
+        # deviation grows with every period spent inactive before this one
+        idle = np.where(self._last_period[active] < 0, 0, period - self._last_period[active])
+        rd = np.minimum(np.sqrt(self.rds[active] ** 2 + idle * self._rd_growth ** 2), DEFAULT_RD)
+        pre_rds = self.rds.copy()
+        pre_rds[active] = rd
+
+        g = self._g(pre_rds[opponents])
+        expected = 1.0 / (1.0 + 10.0 ** (-g * (self.ratings[players] - self.ratings[opponents]) / 400.0))
+        d2_inv = Q ** 2 * np.bincount(players, weights=g ** 2 * expected * (1.0 - expected), minlength=size)
+        gains = np.bincount(players, weights=g * (scores - expected), minlength=size)
+
+        denom = 1.0 / rd ** 2 + d2_inv[active]
+        self.ratings[active] += Q / denom * gains[active]
+        self.rds[active] = np.maximum(np.sqrt(1.0 / denom), MIN_RD)
+        self._last_period[active] = period
+
+    #-------------------------------Database Helpers-------------------------------#
+    def _stream_games(self):
+        """Yields the game history as numpy chunks without loading the whole table into memory"""
+        # unbuffered cursor so rows are pulled from the server as they are fetched
+        stream = self.conn.cursor(pymysql.cursors.SSCursor)
+        try:
+            stream.execute(GAMES_QUERY)
+            while True:
+                rows = stream.fetchmany(self._chunk_size)
+                if not rows: break
+                white, black, score, end_time = zip(*rows)
+                yield (
+                    np.fromiter(white, dtype=np.int64, count=len(rows)),
+                    np.fromiter(black, dtype=np.int64, count=len(rows)),
+                    np.fromiter(score, dtype=np.float64, count=len(rows)),
+                    np.fromiter(end_time, dtype=np.float64, count=len(rows)),
+                )
+        finally:
+            stream.close()
+
+    def _get_user_ids(self) -> np.ndarray:
+        """:returns the id of every existing user (so gaps left by deleted users are never written)"""
+        stream = self.conn.cursor(pymysql.cursors.SSCursor)
+        try:
+            stream.execute(USER_IDS_QUERY)
+            ids = []
+            while True:
+                rows = stream.fetchmany(self._chunk_size)
+                if not rows: break
+                ids.append(np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows)))
+        finally:
+            stream.close()
+        return np.concatenate(ids) if len(ids) > 0 else np.empty(0, dtype=np.int64)
+
+    def _write_ratings(self, user_ids: np.ndarray) -> int:
+        """Bulk writes the rating of every user in 'user_ids' back to the database, returns how many were written"""
+        ratings = np.round(self.ratings[user_ids], 2).tolist()
+        if self._system == "elo":
+            insert_query, apply_query = INSERT_ELO_UPDATES_QUERY, APPLY_ELO_UPDATES_QUERY
+            rows = list(zip(user_ids.tolist(), ratings))
+        else:
+            insert_query, apply_query = INSERT_UPDATES_QUERY, APPLY_UPDATES_QUERY
+            rows = list(zip(user_ids.tolist(), ratings, np.round(self.rds[user_ids], 2).tolist()))
+
+        self.cursor.execute(DROP_UPDATES_QUERY)
+        self.cursor.execute(CREATE_UPDATES_QUERY)
+        try:
+            for lo in range(0, len(rows), self._chunk_size):
+                self.cursor.executemany(insert_query, rows[lo:lo + self._chunk_size])
+            self.cursor.execute(apply_query)
+            self.conn.commit()
+        finally:
+            self.cursor.execute(DROP_UPDATES_QUERY)
+        return len(rows)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Recompute every ChessWeb user's rating from the game history")
+    parser.add_argument(
+        "-db_u", "--db_username",
+        required=False,
+        default="capstone",
+        dest="db_user",
+        help="The username for the Database"
+    )
+    parser.add_argument(
+        "-pwd", "--password",
+        required=False,
+        default=None,
+        dest="pwd",
+        help="The password for the Database"
+    )
+    parser.add_argument(
+        "-d", "--db",
+        required=False,
+        default="ChessWeb",
+        dest="db",
+        help="The name of the database to connect to"
+    )
+    parser.add_argument(
+        "-dbh", "--database_host",
+        required=False,
+        default="localhost",
+        dest="db_host",
+        help="Set the host ip address of the database (can be localhost)"
+    )
+    parser.add_argument(
+        "-s", "--system",
+        choices=["glicko", "elo"],
+        default="glicko",
+        dest="system",
+        help="The rating system to use"
+    )
+    parser.add_argument(
+        "--period_days",
+        type=float,
+        default=7,
+        dest="period_days",
+        help="Length of a rating period in days"
+    )
+    parser.add_argument(
+        "--rd_growth",
+        type=float,
+        default=34.6,
+        dest="rd_growth",
+        help="Glicko 'c' constant: deviation growth per inactive rating period"
+    )
+    parser.add_argument(
+        "-k", "--k_factor",
+        type=float,
+        default=32.0,
+        dest="k_factor",
+        help="Elo k-factor (only used with '--system elo')"
+    )
+    parser.add_argument(
+        "--chunk_size",
+        type=int,
+        default=50000,
+        dest="chunk_size",
+        help="Number of games fetched from the database at a time"
+    )
+
+    args = vars(parser.parse_args())
+
+    engine = RatingEngine(
+        args["db_user"], args["pwd"], args["db"], args["db_host"],
+        system=args["system"],
+        period_secs=int(args["period_days"] * 24 * 60 * 60),
+        rd_growth=args["rd_growth"],
+        k_factor=args["k_factor"],
+        chunk_size=args["chunk_size"]
+    )
+    engine.recompute()
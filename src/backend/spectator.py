@@ -0,0 +1,210 @@
+"""
+    @file Responsible for streaming live games to spectators over socketio
+    \n@Note: Protocol (all payloads are compact json strings, parse them on the client):
+    \n  client -> "spectate"   {"game_id": <int>}   subscribe (also used to resync after a gap)
+    \n  client -> "unspectate" {"game_id": <int>}
+    \n  server -> "snapshot"   {"g": game_id, "p": ply, "m": [moves...], "c": [white_ms, black_ms]}
+    \n  server -> "delta"      {"g": game_id, "p": ply, "m": move, "c": [white_ms, black_ms]}
+    \nA delta's ply is always the previous ply + 1, a client that sees a gap should just wait for/ask for a snapshot
+    \n@Note: Assumes the WebSocket transport (socketio's threading mode + simple-websocket): every spectator holds one
+    open socket that deltas are pushed down as they happen. Long-polling still works but costs a request per batch
+"""
+
+#------------------------------STANDARD DEPENDENCIES-----------------------------#
+import json
+import time
+import threading
+from typing import Optional, Dict, List, Set
+
+#-----------------------------3RD PARTY DEPENDENCIES-----------------------------#
+from flask import request
+from flask_socketio import SocketIO
+
+#--------------------------------OUR DEPENDENCIES--------------------------------#
+
+def encode(payload: dict) -> str:
+    """Compact json (no spaces) since the same string goes out to every spectator"""
+    return json.dumps(payload, separators=(",", ":"))
+
+class SpectatedGame():
+    def __init__(self, game_id: int, white_ms: int, black_ms: int):
+        """
+            \n@param: game_id   - The game's unique id
+            \n@param: white_ms  - White's starting clock (milliseconds)
+            \n@param: black_ms  - Black's starting clock (milliseconds)
+            \n@Note: Hold 'lock' to touch anything here, so a game with many spectators only ever blocks itself
+        """
+        self.game_id = game_id
+        self.moves: List[str] = []
+        self.clocks = [white_ms, black_ms]
+        self.subscribers: Set[str] = set()
+        # sid -> time it fell behind (missing deltas, owed a snapshot)
+        self.lagging: Dict[str, float] = {}
+        self.is_closed = False
+        self.lock = threading.Lock()
+        self._snapshot: Optional[str] = None # cached encoded snapshot (cleared on every move)
+
+    @property
+    def ply(self) -> int:
+        return len(self.moves)
+
+    def apply_move(self, move: str, white_ms: int, black_ms: int) -> str:
+        """Records the move and returns the encoded delta for it"""
+        self.moves.append(move)
+        self.clocks = [white_ms, black_ms]
+        self._snapshot = None
+        return encode({"g": self.game_id, "p": self.ply, "m": move, "c": self.clocks})
+
+    def snapshot(self) -> str:
+        """:returns the encoded full game state (only encoded once per ply no matter how many need it)"""
+        if self._snapshot is None:
+            self._snapshot = encode({"g": self.game_id, "p": self.ply, "m": self.moves, "c": self.clocks})
+        return self._snapshot
+
+    def remove(self, sid: str):
+        """Must be called with self.lock held"""
+        self.subscribers.discard(sid)
+        self.lagging.pop(sid, None)
+
+class SpectatorHub():
+    def __init__(self, socketio: SocketIO, namespace: str = "/spectate",
+                max_backlog: int = 32, drop_after_secs: float = 30):
+        """
+            \n@param: socketio          - The app's socketio server
+            \n@param: namespace         - The socketio namespace spectators connect to
+            \n@param: max_backlog       - Spectators with more unsent packets than this stop getting deltas
+            \n@param: drop_after_secs   - Spectators that stay backed up this long get disconnected
+            \n@Note: Slow spectators never block the broadcaster: their missed deltas are coalesced into a
+            single snapshot once they catch up (or they get dropped)
+            \n@Note: self._lock only guards the game/sid maps and is never held together with a game's lock,
+            so fanning out one game's move doesn't hold up any other game or (un)subscribe
+        """
+        self.socketio = socketio
+        self.namespace = namespace
+        self.max_backlog = max_backlog
+        self.drop_after_secs = drop_after_secs
+
+        self._games: Dict[int, SpectatedGame] = {}
+        # sid -> game_id it is watching
+        self._watching: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+        self.createSocketEvents()
+
+    #----------------------------------Game Side-----------------------------------#
+    def open_game(self, game_id: int, white_ms: int, black_ms: int):
+        """Starts tracking a game so it can be spectated"""
+        with self._lock:
+            if game_id not in self._games:
+                self._games[game_id] = SpectatedGame(game_id, white_ms, black_ms)
+
+    def close_game(self, game_id: int):
+        """Stops tracking a finished game (spectators keep their last state)"""
+        with self._lock:
+            game = self._games.pop(game_id, None)
+        if game is None: return
+
+        with game.lock:
+            game.is_closed = True
+            sids = list(game.subscribers)
+            game.subscribers.clear()
+            game.lagging.clear()
+        with self._lock:
+            for sid in sids:
+                if self._watching.get(sid) == game_id:
+                    del self._watching[sid]
+
+    def publish_move(self, game_id: int, move: str, white_ms: int, black_ms: int) -> bool:
+        """
+            \n@Brief: Sends a move to everyone spectating the game
+            \n@Param: move - The move in UCI notation (i.e. "e2e4")
+            \n@Returns: False if the game is not open
+        """
+        with self._lock:
+            game = self._games.get(game_id)
+        if game is None: return False
+
+        to_drop = []
+        with game.lock:
+            if game.is_closed: return False
+            delta = game.apply_move(move, white_ms, black_ms)
+
+            now = time.monotonic()
+            for sid in list(game.subscribers):
+                if self._backlog(sid) > self.max_backlog:
+                    lagging_since = game.lagging.setdefault(sid, now)
+                    if now - lagging_since > self.drop_after_secs:
+                        game.remove(sid)
+                        to_drop.append(sid)
+                elif sid in game.lagging:
+                    # caught up -> one snapshot replaces every delta it missed
+                    del game.lagging[sid]
+                    self._send(sid, "snapshot", game.snapshot())
+                else:
+                    self._send(sid, "delta", delta)
+
+        if len(to_drop) > 0:
+            with self._lock:
+                for sid in to_drop:
+                    if self._watching.get(sid) == game_id:
+                        del self._watching[sid]
+        # outside every lock since disconnecting fires the "disconnect" handler below
+        for sid in to_drop:
+            self.socketio.server.disconnect(sid, namespace=self.namespace)
+        return True
+
+    #--------------------------------Spectator Side--------------------------------#
+    def createSocketEvents(self):
+        """Wrapper to provide closure for `self`"""
+        @self.socketio.on("spectate", namespace=self.namespace)
+        def spectate(data):
+            game_id = data.get("game_id") if isinstance(data, dict) else None
+            # bool is an int subclass but never a real game id
+            if not isinstance(game_id, int) or isinstance(game_id, bool):
+                return encode({"error": "expected {\"game_id\": <int>}"})
+            sid = request.sid
+            not_playing = encode({"error": f"game {game_id} is not being played"})
+            with self._lock:
+                game = self._games.get(game_id)
+                if game is None: return not_playing
+                prev_game = self._games.get(self._watching.get(sid))
+                self._watching[sid] = game_id
+
+            if prev_game is not None and prev_game is not game:
+                with prev_game.lock:
+                    prev_game.remove(sid)
+            with game.lock:
+                if game.is_closed: return not_playing
+                # snapshot is sent under the game's lock so no delta can sneak in before it
+                game.lagging.pop(sid, None)
+                self._send(sid, "snapshot", game.snapshot())
+                game.subscribers.add(sid)
+
+        @self.socketio.on("unspectate", namespace=self.namespace)
+        def unspectate(data=None):
+            self._unsubscribe(request.sid)
+
+        @self.socketio.on("disconnect", namespace=self.namespace)
+        def disconnect():
+            self._unsubscribe(request.sid)
+
+    #-------------------------------------Helpers----------------------------------#
+    def _unsubscribe(self, sid: str):
+        with self._lock:
+            game = self._games.get(self._watching.pop(sid, None))
+        if game is not None:
+            with game.lock:
+                game.remove(sid)
+
+    def _send(self, sid: str, event: str, payload: str):
+        # socketio only queues the packet, it never waits on the spectator's connection
+        self.socketio.emit(event, payload, room=sid, namespace=self.namespace)
+
+    def _backlog(self, sid: str) -> int:
+        """:returns the number of packets queued but not yet sent to the spectator"""
+        server = self.socketio.server
+        try:
+            eio_sid = server.manager.eio_sid_from_sid(sid, self.namespace)
+            return server.eio.sockets[eio_sid].queue.qsize()
+        except (KeyError, AttributeError):
+            return 0
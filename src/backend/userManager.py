@@ -6,6 +6,8 @@
 import base64
 from datetime import datetime, timedelta
 import os
+import unicodedata
+from typing import Optional, List
 
 #-----------------------------3RD PARTY DEPENDENCIES-----------------------------#
 # from werkzeug.contrib.securecookie import SecureCookie
@@ -14,15 +16,26 @@ from flask_login import LoginManager
 
 #--------------------------------OUR DEPENDENCIES--------------------------------#
 from db_manager import DB_Manager
+from password_hasher import PasswordHasher
+from bloom_filter import BloomFilter
 from user import User
 
 class UserManager(LoginManager, DB_Manager):
-    def __init__(self, app: Flask, user: str, pwd: str, db: str, host: str):
+    def __init__(self, app: Flask, user: str, pwd: str, db: str, host: str,
+                hash_schemes: Optional[List[str]] = None,
+                hash_rounds: Optional[int] = None,
+                hash_workers: int = 4,
+                username_filter_size: int = 1000000):
         """
-            \n@param: app   - The flask app
-            \n@param: user  - The username to connect to database with
-            \n@param: pwd   - The password to connect to database with
-            \n@param: db    - The name of the database to connect with
+            \n@param: app           - The flask app
+            \n@param: user          - The username to connect to database with
+            \n@param: pwd           - The password to connect to database with
+            \n@param: db            - The name of the database to connect with
+            \n@param: hash_schemes  - passlib schemes for user passwords (first = used for new hashes)
+            \n@param: hash_rounds   - Cost of the default password hash scheme (None = passlib default)
+            \n@param: hash_workers  - Number of threads that hash/verify passwords
+            \n@param: username_filter_size - Minimum number of usernames the in-memory "is taken" filter is sized for
+                (grows to twice the current number of users if that is bigger)
         """
         self.flaskApp = app
 
@@ -32,8 +45,81 @@ class UserManager(LoginManager, DB_Manager):
         # Create Database Manager
         DB_Manager.__init__(self, user, pwd, db, host)
 
+        # passwords are hashed by the server (off the request threads), the database only ever sees hashes
+        self.pwd_hasher = PasswordHasher(hash_schemes, hash_rounds, max_workers=hash_workers)
+
+        # taken usernames kept in memory so most "does it exist" checks never reach the database
+        self.username_filter = None
+        self.is_username_filter_ready = False
+        self.build_username_filter(username_filter_size)
+
         self.createLoginManager()
 
+    @staticmethod
+    def normalize_username(uname: str) -> str:
+        """
+            \n@Brief: Collapses usernames the database collation treats as equal (case, accents, trailing spaces)
+            \n@Note: Over-collapsing only causes extra database lookups, never a wrong answer
+        """
+        decomposed = unicodedata.normalize("NFKD", uname.rstrip(" "))
+        return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+    def build_username_filter(self, min_size: int):
+        """Streams the users table into the username filter (if it fails, every check falls back to the database)"""
+        try:
+            # leave room for the table to double before the false positive rate starts to climb
+            self.username_filter = BloomFilter(max(min_size, 2 * self.count_users()))
+            self.username_filter.update(self.normalize_username(uname) for uname in self.stream_usernames())
+            self.is_username_filter_ready = True
+            print(f"Loaded {self.username_filter.count} usernames into the username filter " +
+                f"(sized for {self.username_filter.capacity})")
+            self.warn_if_username_filter_full()
+        except Exception as err:
+            print(f"build_username_filter error: {err}")
+
+    def warn_if_username_filter_full(self):
+        if self.username_filter.is_over_capacity:
+            print(f"WARNING: username filter holds {self.username_filter.count} usernames but is sized for " +
+                f"{self.username_filter.capacity}, more signups will reach the database (restart to resize it)")
+
+    def does_username_exist(self, uname: str) -> bool:
+        """Returns True if 'uname' is taken (only asks the database if the filter says it might be)"""
+        if self.is_username_filter_ready and self.normalize_username(uname) not in self.username_filter:
+            return False
+        return DB_Manager.does_username_exist(self, uname)
+
+    def add_user(self, fname: str, lname: str, username: str, pwd: str) -> int:
+        """Hashes 'pwd' and creates the user. Returns the new user's id (-1 if error)"""
+        user_id = DB_Manager.add_user(self, fname, lname, username, self.pwd_hasher.hash(pwd))
+        if user_id != -1 and self.is_username_filter_ready:
+            self.username_filter.add(self.normalize_username(username))
+            # only warn the moment it crosses capacity instead of on every signup after
+            if self.username_filter.count == self.username_filter.capacity + 1:
+                self.warn_if_username_filter_full()
+        return user_id
+
+    def update_pwd(self, uname: str, pwd: str) -> bool:
+        """Hashes 'pwd' and stores it as the user's new password. Returns -1 on error, 1 on success"""
+        return DB_Manager.update_pwd(self, uname, self.pwd_hasher.hash(pwd))
+
+    def check_password(self, uname: str, pwd: str) -> bool:
+        """
+            \n@Brief: Returns True if password and username are valid to login
+            \n@Note: If the stored hash uses an outdated scheme/cost, it is transparently replaced with a new one
+            \n@Note: Hashes in a format no configured scheme knows were made by the old procedures, so those are
+            checked by the database one last time and replaced with a server side hash on success
+        """
+        pwd_hash = self.get_pwd_hash(uname)
+        if pwd_hash and not self.pwd_hasher.is_known_hash(pwd_hash):
+            if not self.check_legacy_password(uname, pwd): return False
+            DB_Manager.update_pwd(self, uname, self.pwd_hasher.hash(pwd))
+            return True
+
+        is_valid, new_hash = self.pwd_hasher.verify_and_update(pwd, pwd_hash)
+        if is_valid and new_hash is not None:
+            DB_Manager.update_pwd(self, uname, new_hash)
+        return is_valid
+
     def createLoginManager(self):
         """
             \n@Brief: Helper function that creates all the necessary login manager attributes (callbacks)
@@ -0,0 +1,37 @@
+/**
+ * @brief Live "is this username free" check for the signup page
+ */
+import { async_post_request } from './utils.js';
+
+const check_delay_ms = 300; // wait for the user to stop typing before asking the server
+let check_timer = null;
+
+/**
+ * @brief Asks the server if the typed username is free and shows the answer under the box
+ * @param {string} username The username currently typed in
+ */
+async function check_username(username) {
+    const help = $("#username-availability");
+    if (username.trim().length === 0) {
+        help.text("").removeClass("is-success is-danger");
+        return;
+    }
+
+    const res = await async_post_request("/user/username_available", {"username": username});
+    // ignore stale answers (user kept typing while request was in flight)
+    if (res === 'err' || res.username !== $("#username").val()) return;
+
+    if (res.available) {
+        help.text("Username " + res.username + " is available").removeClass("is-danger").addClass("is-success");
+    } else {
+        help.text("Username " + res.username + " is already taken").removeClass("is-success").addClass("is-danger");
+    }
+}
+
+$(document).ready(function() {
+    $("#username").on("input", function() {
+        clearTimeout(check_timer);
+        const username = $(this).val();
+        check_timer = setTimeout(() => check_username(username), check_delay_ms);
+    });
+});